@@ -1,18 +1,35 @@
-import requests
+import httpx
+import orjson
 import geopandas as gpd
 import pandas as pd
-from fastapi import FastAPI, Query, Request, UploadFile, File, Header, HTTPException
-from fastapi.responses import HTMLResponse
+import numpy as np
+from fastapi import FastAPI, Query, Request, Header, HTTPException
+from fastapi.responses import HTMLResponse, JSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from starlette.concurrency import run_in_threadpool
+from pydantic import BaseModel
+import shapely
 from shapely.geometry import Point
+from pyproj import Transformer
 import os
 import re
 import csv
+import signal
+import tempfile
+import threading
+import time
+import hashlib
+import hmac
+import asyncio
 import logging
+from collections import OrderedDict
+from dataclasses import dataclass, replace
 from functools import lru_cache
-from datetime import datetime, date
-from io import StringIO, BytesIO
+from datetime import date
+from io import BytesIO
 from google.cloud import storage as gcs_storage
+from google.api_core.exceptions import NotFound, NotModified
 
 logger = logging.getLogger(__name__)
 
@@ -20,18 +37,47 @@ logger = logging.getLogger(__name__)
 # CONFIGURATION
 # ---------------------------------------------------
 SHAPEFILE_PATH = os.path.join(os.path.dirname(__file__), "CDTFA_TaxDistricts.gpkg")
+# Pre-processed GeoParquet copy of SHAPEFILE_PATH, generated at image build
+DISTRICTS_PARQUET_PATH = os.path.join(os.path.dirname(__file__), "CDTFA_TaxDistricts.parquet")
 COUPONS_CSV_PATH = os.path.join(os.path.dirname(__file__), "coupons.csv")
 COUPONS_XLSX_PATH = os.path.join(os.path.dirname(__file__), "coupons.xlsx")
 GEOCODE_URL = "https://geocode-api.arcgis.com/arcgis/rest/services/World/GeocodeServer/findAddressCandidates"
 ARCGIS_API_KEY = os.environ.get("ARCGIS_API_KEY")
 
+# Working CRS for district polygons: California Albers (equal-area, metres),
+# which gives tighter bounding boxes than lat/lon degrees for the STRtree
+DISTRICTS_EPSG = 3310
+
+# Attributes that identify a tax district (used to merge split polygons)
+DISTRICT_KEY_COLUMNS = ["JURIS_NAME", "County_name", "City_name", "RATE"]
+# Canonical county/city columns and the alternate names other CDTFA exports use
+DISTRICT_NAME_COLUMNS = {
+    "County_name": ["County_nam"],
+    "City_name": ["City_Name_Proper", "City_Name_"],
+}
+# Everything find_tax_district reads; other attributes are dropped at load
+DISTRICT_COLUMNS = [
+    "JURIS_NAME",
+    *(col for name, alternates in DISTRICT_NAME_COLUMNS.items() for col in (name, *alternates)),
+    "RATE",
+]
+# Columns every loaded district table has, in District field order
+DISTRICT_FIELDS = ["JURIS_NAME", "County_name", "City_name", "RATE", "county_norm", "city_norm"]
+
 # Cloud Storage bucket (fallback source for coupon files, accessed via service account)
 COUPONS_GCS_BUCKET = os.environ.get("COUPONS_BUCKET", "agromin-coupon-data")
 
 # Simple API key for upload endpoint (set this in Cloud Run environment)
 UPLOAD_API_KEY = os.environ.get("UPLOAD_API_KEY", "change-this-secret-key")
 
-app = FastAPI(title="Coupon Validation API", version="2.0.0")
+class ORJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson (FastAPI's own ORJSONResponse is deprecated)."""
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+
+
+app = FastAPI(title="Coupon Validation API", version="2.0.0", default_response_class=ORJSONResponse)
 
 # CORS configuration for browser-based clients (e.g., CIMcloud frontend)
 _cors_origins = os.environ.get(
@@ -50,47 +96,163 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Compress the form page and large batch responses; tiny JSON replies skip it.
+app.add_middleware(GZipMiddleware, minimum_size=500)
 
 # ---------------------------------------------------
 # DATA LOADING (cached at startup)
 # ---------------------------------------------------
-@lru_cache(maxsize=1)
-def load_tax_districts():
-    """Load CDTFA shapefile and convert CRS to WGS84."""
-    gdf = gpd.read_file(SHAPEFILE_PATH)
+_tax_districts = None
+
+def load_tax_districts() -> gpd.GeoDataFrame:
+    """Return the CDTFA tax districts, reading the file on first use."""
+    global _tax_districts
+    if _tax_districts is None:
+        _tax_districts = _read_tax_districts()
+    return _tax_districts
+
+
+def _read_tax_districts() -> gpd.GeoDataFrame:
+    """Load the districts (GeoParquet copy if current, else the GeoPackage) and index them."""
+    gdf = None
+    if (os.path.exists(DISTRICTS_PARQUET_PATH)
+            and os.path.getmtime(DISTRICTS_PARQUET_PATH) >= os.path.getmtime(SHAPEFILE_PATH)):
+        gdf = gpd.read_parquet(DISTRICTS_PARQUET_PATH)
+        # A copy written by older code may lack columns added since; rebuild then.
+        missing = [c for c in DISTRICT_FIELDS if c not in gdf.columns]
+        if missing:
+            logger.warning("Ignoring %s: missing columns %s", DISTRICTS_PARQUET_PATH, missing)
+            gdf = None
+    if gdf is None:
+        gdf = _clean_tax_districts()
+    # Build the STRtree now so the first request doesn't pay for it, and mark
+    # the polygons prepared so repeated contains() checks reuse GEOS edge indexes.
+    gdf.sindex
+    shapely.prepare(np.asarray(gdf.geometry.values))
+    return gdf
+
+
+def _clean_tax_districts() -> gpd.GeoDataFrame:
+    """Load CDTFA shapefile and convert CRS to California Albers (DISTRICTS_EPSG)."""
+    # pyogrio + Arrow reads the layer in columnar batches instead of per feature,
+    # and only the attributes find_tax_district reads are decoded at all.
+    gdf = gpd.read_file(SHAPEFILE_PATH, engine="pyogrio", use_arrow=True, columns=DISTRICT_COLUMNS)
     if gdf.crs is None:
         gdf.set_crs(epsg=3857, inplace=True)
-    gdf = gdf.to_crs(epsg=4326)
+    # Reprojecting rewrites every vertex, so skip it when the file already matches.
+    if gdf.crs.to_epsg() != DISTRICTS_EPSG:
+        gdf = gdf.to_crs(epsg=DISTRICTS_EPSG)
+    # Coalesce the name variants into one column each (first non-empty wins)
+    # so the lookup reads a single field.
+    for name, alternates in DISTRICT_NAME_COLUMNS.items():
+        merged = pd.Series("", index=gdf.index, dtype=object)
+        for col in reversed([c for c in (name, *alternates) if c in gdf.columns]):
+            values = gdf[col]
+            merged = values.where(values.notna() & (values != ""), merged)
+        gdf = gdf.drop(columns=[c for c in alternates if c in gdf.columns])
+        gdf[name] = merged
+    # Some exports lack these; keep the columns so District can always be built.
+    for col in ("JURIS_NAME", "RATE"):
+        if col not in gdf.columns:
+            gdf[col] = None
+    # One (multi)polygon per district keeps the STRtree small. Current CDTFA
+    # exports already ship that way, so only dissolve when rows are split.
+    keys = [c for c in DISTRICT_KEY_COLUMNS if c in gdf.columns]
+    if keys and gdf.duplicated(keys).any():
+        gdf = gdf.dissolve(by=keys, as_index=False, dropna=False)
+    # Normalized names are fixed per district, so compute them once here
+    # instead of on every jurisdiction comparison.
+    gdf["county_norm"] = _normalize_jurisdictions(gdf["County_name"])
+    gdf["city_norm"] = _normalize_jurisdictions(gdf["City_name"])
+    # County/city names repeat across districts, so store them as categoricals.
+    for name in (*DISTRICT_NAME_COLUMNS, "county_norm", "city_norm"):
+        gdf[name] = gdf[name].astype("category")
     return gdf
 
+
+def write_districts_parquet(path: str = DISTRICTS_PARQUET_PATH):
+    """
+    Write the cleaned, reprojected districts as GeoParquet.
+    Run at image build so cold starts skip the GeoPackage decode and reprojection.
+    """
+    _clean_tax_districts().to_parquet(path)
+
 # ---------------------------------------------------
 # COUPON DATA LOADING
 # ---------------------------------------------------
+COUPON_CACHE_TTL = 300  # seconds; lets sheet updates land without a redeploy
 _coupon_cache = {}
-_coupon_cache_time = None
+# time.monotonic() after which _coupon_cache is revalidated
+_coupon_cache_deadline = 0.0
+# (source, mtime or GCS generation) of the file _coupon_cache was parsed from
+_coupon_cache_version = None
+# Coupon blob that last loaded from GCS; tried first on the next refresh
+_coupon_last_blob = None
+# Serializes refreshes so concurrent requests at TTL expiry share one fetch
+_coupon_lock = threading.Lock()
+
+
+@lru_cache(maxsize=1)
+def _gcs_bucket():
+    """Coupon bucket handle on one shared client, so GCS calls reuse its pooled HTTPS session."""
+    return gcs_storage.Client().bucket(COUPONS_GCS_BUCKET)
+
+def _coupon_cache_is_current(version: tuple, force_refresh: bool) -> bool:
+    """True when the cached coupons were parsed from this exact file version."""
+    return not force_refresh and bool(_coupon_cache) and version == _coupon_cache_version
+
+
+def _cached_generation(blob_name: str, force_refresh: bool):
+    """GCS generation of the cached coupons if they came from blob_name, else None."""
+    if not force_refresh and _coupon_cache and _coupon_cache_version and _coupon_cache_version[0] == blob_name:
+        return _coupon_cache_version[1]
+    return None
+
+
+def _touch_coupon_cache() -> dict:
+    """Restart the TTL on the cached coupons after confirming the source is unchanged."""
+    global _coupon_cache_deadline
+    _coupon_cache_deadline = time.monotonic() + COUPON_CACHE_TTL
+    return _coupon_cache
+
 
 def load_coupons(force_refresh: bool = False) -> dict:
     """
     Load coupon data from XLSX or CSV (local first, then Cloud Storage).
     Returns dict keyed by coupon code.
-    Caches for 5 minutes to allow updates without redeploy.
+    Caches for 5 minutes to allow updates without redeploy; on expiry a
+    source that hasn't changed since the last parse is not re-read.
     Tries xlsx first, then falls back to csv.
     """
-    global _coupon_cache, _coupon_cache_time
-    
-    # Check cache (5 minute TTL)
-    if not force_refresh and _coupon_cache and _coupon_cache_time:
-        age = (datetime.now() - _coupon_cache_time).seconds
-        if age < 300:  # 5 minutes
+    # Check cache (COUPON_CACHE_TTL) without the lock; re-check once holding it,
+    # since another thread may have refreshed while we waited.
+    if not force_refresh and _coupon_cache_fresh():
+        return _coupon_cache
+    with _coupon_lock:
+        if not force_refresh and _coupon_cache_fresh():
             return _coupon_cache
-    
+        return _fetch_coupons(force_refresh)
+
+
+def _coupon_cache_fresh() -> bool:
+    """True when cached coupons exist and are inside the TTL."""
+    return bool(_coupon_cache) and time.monotonic() < _coupon_cache_deadline
+
+
+def _fetch_coupons(force_refresh: bool) -> dict:
+    """Read coupons from the first available source. Caller holds _coupon_lock."""
+    global _coupon_last_blob
     df = None
     
     source = None
+    version = None
 
     # Prefer locally uploaded files so admin uploads take effect immediately.
     if os.path.exists(COUPONS_XLSX_PATH):
         try:
+            version = (COUPONS_XLSX_PATH, os.stat(COUPONS_XLSX_PATH).st_mtime_ns)
+            if _coupon_cache_is_current(version, force_refresh):
+                return _touch_coupon_cache()
             df = pd.read_excel(COUPONS_XLSX_PATH, engine='openpyxl')
             source = f"local file {COUPONS_XLSX_PATH}"
         except Exception:
@@ -98,87 +260,109 @@ def load_coupons(force_refresh: bool = False) -> dict:
     
     if df is None and os.path.exists(COUPONS_CSV_PATH):
         try:
+            version = (COUPONS_CSV_PATH, os.stat(COUPONS_CSV_PATH).st_mtime_ns)
+            if _coupon_cache_is_current(version, force_refresh):
+                return _touch_coupon_cache()
             df = pd.read_csv(COUPONS_CSV_PATH)
             source = f"local file {COUPONS_CSV_PATH}"
         except Exception:
             pass
     
-    # Fall back to Cloud Storage (authenticated via service account)
+    # Fall back to Cloud Storage (authenticated via service account). Downloads
+    # are conditional on the cached generation, so an unchanged blob is a 304,
+    # and the blob that worked last time goes first so a CSV-only bucket
+    # doesn't pay for a failed xlsx GET on every refresh.
     if df is None:
-        try:
-            client = gcs_storage.Client()
-            bucket = client.bucket(COUPONS_GCS_BUCKET)
-            blob = bucket.blob("coupons.xlsx")
-            if blob.exists():
-                df = pd.read_excel(BytesIO(blob.download_as_bytes()), engine='openpyxl')
-                source = f"GCS gs://{COUPONS_GCS_BUCKET}/coupons.xlsx"
-        except Exception:
-            pass
-    
-    if df is None:
-        try:
-            client = gcs_storage.Client()
-            bucket = client.bucket(COUPONS_GCS_BUCKET)
-            blob = bucket.blob("coupons.csv")
-            if blob.exists():
-                df = pd.read_csv(StringIO(blob.download_as_string().decode("utf-8")))
-                source = f"GCS gs://{COUPONS_GCS_BUCKET}/coupons.csv"
-        except Exception:
-            pass
+        blob_names = sorted(["coupons.xlsx", "coupons.csv"], key=lambda name: name != _coupon_last_blob)
+        for blob_name in blob_names:
+            try:
+                blob = _gcs_bucket().blob(blob_name)
+                content = blob.download_as_bytes(
+                    if_generation_not_match=_cached_generation(blob_name, force_refresh)
+                )
+                if blob_name.endswith(".xlsx"):
+                    df = pd.read_excel(BytesIO(content), engine='openpyxl')
+                else:
+                    df = pd.read_csv(BytesIO(content))
+            except NotModified:
+                return _touch_coupon_cache()
+            except Exception:
+                continue
+            source = f"GCS gs://{COUPONS_GCS_BUCKET}/{blob_name}"
+            version = (blob_name, blob.generation)
+            _coupon_last_blob = blob_name
+            break
     
     if df is None:
         logger.warning("No coupon data found from any source")
         return {}
     
-    # Parse DataFrame to coupons dict
-    coupons = {}
-    for _, row in df.iterrows():
-        code = str(row.get('Coupon', '')).strip().upper()
-        if code and code != 'NAN':
-            coupons[code] = {
-                'code': code,
-                'status': str(row.get('Program Status', '')).strip(),
-                'jurisdiction': str(row.get('Jurisdiction', '')).strip(),
-                'start_date': parse_date(row.get('Start Date')),
-                'end_date': parse_date(row.get('End Date')),
-            }
-    
-    _coupon_cache = coupons
-    _coupon_cache_time = datetime.now()
+    coupons = _build_coupons_dict(df)
+    _publish_coupons(coupons, version)
     logger.info("Loaded %d coupons from %s", len(coupons), source)
     return coupons
 
 
-def parse_date(date_val) -> date | None:
-    """Parse date from string (M/D/YY) or pandas Timestamp."""
-    if date_val is None or (isinstance(date_val, float) and pd.isna(date_val)):
-        return None
-    
-    # Handle pandas Timestamp
-    if isinstance(date_val, pd.Timestamp):
-        return date_val.date()
-    
-    # Handle datetime
-    if isinstance(date_val, datetime):
-        return date_val.date()
-    
-    # Handle date
-    if isinstance(date_val, date):
-        return date_val
-    
-    # Handle string
-    try:
-        date_str = str(date_val).strip()
-        if not date_str or date_str.lower() == 'nan':
-            return None
-        # Handle M/D/YY format
-        return datetime.strptime(date_str, "%m/%d/%y").date()
-    except ValueError:
-        try:
-            # Try M/D/YYYY format
-            return datetime.strptime(date_str, "%m/%d/%Y").date()
-        except ValueError:
-            return None
+def _publish_coupons(coupons: dict, version: tuple) -> None:
+    """Swap in a freshly parsed coupon dict and restart its TTL."""
+    global _coupon_cache, _coupon_cache_deadline, _coupon_cache_version
+    _coupon_cache = coupons
+    _coupon_cache_deadline = time.monotonic() + COUPON_CACHE_TTL
+    _coupon_cache_version = version
+
+
+def _build_coupons_dict(df: pd.DataFrame) -> dict:
+    """Parse a coupon sheet DataFrame into a dict keyed by coupon code, a column at a time."""
+    df = df.reindex(columns=['Coupon', 'Program Status', 'Jurisdiction', 'Start Date', 'End Date'])
+    codes = df['Coupon'].fillna('').astype(str).str.strip().str.upper()
+    jurisdictions = df['Jurisdiction'].fillna('').astype(str).str.strip()
+    records = pd.DataFrame({
+        'code': codes,
+        'status': df['Program Status'].fillna('').astype(str).str.strip(),
+        'jurisdiction': jurisdictions,
+        # Matching inputs, computed once per sheet instead of per validation
+        'jurisdiction_norm': _normalize_jurisdictions(jurisdictions),
+        'is_city': jurisdictions.str.contains('city', case=False, regex=False),
+        'start_date': parse_dates(df['Start Date']),
+        'end_date': parse_dates(df['End Date']),
+    })[codes.ne('') & codes.ne('NAN')]
+    return {record['code']: record for record in records.to_dict('records')}
+
+
+def _parse_coupon_bytes(content: bytes, is_excel: bool) -> dict:
+    """
+    Parse an uploaded coupon file straight from memory.
+    Raises ValueError unless it is a coupon sheet with at least one code, so
+    an error page or blank sheet is rejected before anything is replaced.
+    """
+    if is_excel:
+        df = pd.read_excel(BytesIO(content), engine='openpyxl')
+    else:
+        df = pd.read_csv(BytesIO(content))
+    if 'Coupon' not in df.columns:
+        raise ValueError("missing 'Coupon' column")
+    coupons = _build_coupons_dict(df)
+    if not coupons:
+        raise ValueError("no coupon codes found")
+    return coupons
+
+
+def parse_dates(values: pd.Series) -> pd.Series:
+    """
+    Parse a column of dates given as strings (M/D/YY or M/D/YYYY) or
+    Timestamps/datetimes. Returns datetime.date values, None where unparseable.
+    """
+    if pd.api.types.is_datetime64_any_dtype(values):
+        parsed = values
+    else:
+        # Datetime cells pass straight through; strings need stripping first
+        text = values.astype(str).str.strip()
+        parsed = (
+            pd.to_datetime(values, format="%m/%d/%y", errors="coerce")
+            .fillna(pd.to_datetime(text, format="%m/%d/%y", errors="coerce"))
+            .fillna(pd.to_datetime(text, format="%m/%d/%Y", errors="coerce"))
+        )
+    return parsed.dt.date.astype(object).where(parsed.notna(), None)
 
 
 def validate_coupon_dates(coupon: dict) -> tuple[bool, str]:
@@ -202,17 +386,60 @@ async def startup_event():
     load_tax_districts()
     load_coupons()
 
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await GEOCODE_CLIENT.aclose()
+
 # ---------------------------------------------------
 # HELPERS
 # ---------------------------------------------------
-def geocode_address(address: str):
+# Shared async client keeps HTTP/2 connections to the geocoder alive and
+# lets other requests run on the event loop while a geocode is in flight.
+GEOCODE_CLIENT = httpx.AsyncClient(
+    timeout=15.0,
+    transport=httpx.AsyncHTTPTransport(
+        http2=True,
+        retries=2,
+        limits=httpx.Limits(max_keepalive_connections=32),
+    ),
+)
+
+
+# Geocode results keyed on the case-folded, whitespace-collapsed address.
+GEOCODE_CACHE_SIZE = 10_000
+_geocode_cache: OrderedDict = OrderedDict()
+_geocode_cache_hits = 0
+_geocode_cache_misses = 0
+
+
+async def geocode_address(address: str):
+    """Geocode an address, serving repeat lookups from an in-memory LRU cache."""
+    global _geocode_cache_hits, _geocode_cache_misses
+
+    key = " ".join(address.upper().split())
+    cached = _geocode_cache.get(key)
+    if cached is not None:
+        _geocode_cache.move_to_end(key)
+        _geocode_cache_hits += 1
+        return cached
+
+    _geocode_cache_misses += 1
+    result = await _geocode_arcgis(address)
+    _geocode_cache[key] = result
+    if len(_geocode_cache) > GEOCODE_CACHE_SIZE:
+        _geocode_cache.popitem(last=False)
+    return result
+
+
+async def _geocode_arcgis(address: str):
     """Use ArcGIS geocoder to get lat/lon and matched address."""
     params = {"f": "json", "singleLine": address, "outFields": "Match_addr", "maxLocations": 1}
     if ARCGIS_API_KEY:
         params["token"] = ARCGIS_API_KEY
-    r = requests.get(GEOCODE_URL, params=params, timeout=15)
+    r = await GEOCODE_CLIENT.get(GEOCODE_URL, params=params)
     r.raise_for_status()
-    data = r.json()
+    data = orjson.loads(r.content)
     if not data.get("candidates"):
         return None, None, None
     cand = data["candidates"][0]
@@ -221,21 +448,141 @@ def geocode_address(address: str):
     return loc["y"], loc["x"], match_addr
 
 
-def find_tax_district(lat: float, lon: float, gdf: gpd.GeoDataFrame):
+@dataclass(frozen=True, slots=True)
+class District:
+    """Attributes of the CDTFA tax district containing a point."""
+    jurisdiction: str
+    county: str
+    city: str
+    rate: float | None
+    county_norm: str
+    city_norm: str
+
+
+# Geocoder results are WGS84 lat/lon; districts live in DISTRICTS_EPSG.
+_TO_DISTRICTS_CRS = Transformer.from_crs(4326, DISTRICTS_EPSG, always_xy=True)
+
+
+def find_tax_district(lat: float, lon: float, gdf: gpd.GeoDataFrame) -> District | None:
     """Find which CDTFA tax district polygon contains the given point."""
-    point = Point(lon, lat)
-    match = gdf[gdf.contains(point)]
-    if match.empty:
+    point = Point(_TO_DISTRICTS_CRS.transform(lon, lat))
+    # STRtree gives bounding-box candidates; the exact test runs on the
+    # prepared polygons (an STRtree predicate would only prepare the point).
+    candidates = gdf.sindex.query(point)
+    # Sorted so overlapping districts keep file-order precedence
+    hits = np.sort(candidates[shapely.contains(gdf.geometry.values[candidates], point)])
+    if len(hits) == 0:
         return None
-    row = match.iloc[0]
-    return {
-        "jurisdiction": row.get("JURIS_NAME"),
-        "county": row.get("County_name") or row.get("County_nam"),
-        "city": row.get("City_name") or row.get("City_Name_Proper") or row.get("City_Name_"),
-        "rate": row.get("RATE"),
-    }
+    districts = _districts_at(gdf, hits)
+    return districts[0] if len(districts) == 1 else _merge_districts(districts)
+
+
+def find_tax_districts(lats, lons, gdf: gpd.GeoDataFrame) -> list:
+    """Resolve many points with one bulk STRtree query; None where no district matches."""
+    points = shapely.points(*_TO_DISTRICTS_CRS.transform(lons, lats))
+    point_idx, district_idx = gdf.sindex.query(points)
+    inside = shapely.contains(gdf.geometry.values[district_idx], points[point_idx])
+    point_idx, district_idx = point_idx[inside], district_idx[inside]
+    # File order within each point, as in find_tax_district
+    order = np.lexsort((district_idx, point_idx))
+    point_idx, district_idx = point_idx[order], district_idx[order]
+    districts = [[] for _ in range(len(points))]
+    for p, district in zip(point_idx, _districts_at(gdf, district_idx)):
+        districts[p].append(district)
+    return [
+        None if not hits else hits[0] if len(hits) == 1 else _merge_districts(hits)
+        for hits in districts
+    ]
+
+
+def _merge_districts(districts: list) -> District:
+    """
+    Merge districts overlapping one point: the first hit, with a blank
+    city or county taken from the first overlapping district that has one.
+    """
+    first = districts[0]
+    county = next((d for d in districts if d.county), first)
+    city = next((d for d in districts if d.city), first)
+    return replace(
+        first,
+        county=county.county, county_norm=county.county_norm,
+        city=city.city, city_norm=city.city_norm,
+    )
+
+
+def _districts_at(gdf: gpd.GeoDataFrame, indices) -> list:
+    """Districts for the given row positions: one column slice + plain tuples, not a Series per row."""
+    rows = gdf.iloc[indices][DISTRICT_FIELDS]
+    return [District(*row) for row in rows.itertuples(index=False, name=None)]
+
+
+# Grid cells per degree for the district cache (1e-4 degrees is ~11 m)
+DISTRICT_CELLS_PER_DEGREE = 10_000
+DISTRICT_CELL_CACHE_SIZE = 50_000
+# (lat_q, lon_q) integer grid cell -> District, only for cells wholly inside one district
+_district_cells: OrderedDict = OrderedDict()
+_district_cell_hits = 0
+_district_cell_misses = 0
+
+
+def _cell_inside_one_district(lat_q: int, lon_q: int, gdf: gpd.GeoDataFrame) -> bool:
+    """True when grid cell (lat_q, lon_q) touches one district and lies strictly inside it."""
+    half = 0.5 / DISTRICT_CELLS_PER_DEGREE
+    lat, lon = lat_q / DISTRICT_CELLS_PER_DEGREE, lon_q / DISTRICT_CELLS_PER_DEGREE
+    xs, ys = _TO_DISTRICTS_CRS.transform(
+        [lon - half, lon + half, lon + half, lon - half],
+        [lat - half, lat - half, lat + half, lat + half],
+    )
+    cell = shapely.Polygon(zip(xs, ys))
+    touching = gdf.sindex.query(cell, predicate="intersects")
+    return len(touching) == 1 and bool(shapely.contains_properly(gdf.geometry.values[touching[0]], cell))
+
+
+def find_tax_district_cached(lat: float, lon: float):
+    """
+    find_tax_district memoized per grid cell. Lookups always run on the
+    actual point, and a cell is only cached when every point in it would
+    get the same answer, so cells on a district boundary are never reused.
+    """
+    global _district_cell_hits, _district_cell_misses
+
+    key = (round(lat * DISTRICT_CELLS_PER_DEGREE), round(lon * DISTRICT_CELLS_PER_DEGREE))
+    cached = _district_cells.get(key)
+    if cached is not None:
+        _district_cells.move_to_end(key)
+        _district_cell_hits += 1
+        return cached
+
+    _district_cell_misses += 1
+    gdf = load_tax_districts()
+    district = find_tax_district(lat, lon, gdf)
+    if district is not None and _cell_inside_one_district(*key, gdf):
+        _district_cells[key] = district
+        if len(_district_cells) > DISTRICT_CELL_CACHE_SIZE:
+            _district_cells.popitem(last=False)
+    return district
+
+
+def reload_tax_districts():
+    """Drop the loaded districts and cached lookups so the next request re-reads the file."""
+    global _tax_districts
+    _tax_districts = None
+    _district_cells.clear()
+
+
+# `kill -HUP <pid>` picks up a replaced CDTFA file without a restart.
+if hasattr(signal, "SIGHUP"):
+    signal.signal(signal.SIGHUP, lambda signum, frame: reload_tax_districts())
 
 
+# City/county prefixes and suffixes stripped by normalize_jurisdiction, in one pass.
+_JURISDICTION_AFFIXES = re.compile(
+    r'\bcity of\b|,\s*city of\b|\bcity\b|\bcounty of\b|,\s*county of\b|\bcounty\b',
+    re.IGNORECASE,
+)
+
+
+@lru_cache(maxsize=4096)
 def normalize_jurisdiction(name: str) -> str:
     """
     Normalize jurisdiction name by removing prefixes/suffixes.
@@ -246,22 +593,8 @@ def normalize_jurisdiction(name: str) -> str:
     if not name:
         return ""
     
-    normalized = name.lower().strip()
-    
-    # Remove common patterns
-    patterns = [
-        r'\bcity of\b',
-        r',\s*city of\b',
-        r'\bcity\b',
-        r'\bcounty of\b',
-        r',\s*county of\b',
-        r'\bcounty\b',
-    ]
-    
-    for pattern in patterns:
-        normalized = re.sub(pattern, '', normalized, flags=re.IGNORECASE)
-    
-    return normalized.strip()
+    normalized = _JURISDICTION_AFFIXES.sub('', name.lower().strip())
+    return " ".join(normalized.split())
 
 
 def is_city_claim(jurisdiction: str) -> bool:
@@ -284,24 +617,38 @@ def is_unincorporated_area(city_name: str | None) -> bool:
     return "unincorporated" in normalized_city
 
 
-def jurisdictions_match(claimed: str, actual_city: str, actual_county: str) -> tuple:
+def jurisdictions_match(
+    claimed: str,
+    actual_city: str,
+    actual_county: str,
+    actual_city_norm: str | None = None,
+    actual_county_norm: str | None = None,
+    claimed_norm: str | None = None,
+    city_claim: bool | None = None,
+) -> tuple:
     """
     Compare claimed jurisdiction against actual city/county.
+    Pass actual_*_norm (e.g. District.city_norm) to skip re-normalizing them,
+    and claimed_norm / city_claim (e.g. a coupon's jurisdiction_norm / is_city)
+    to skip re-deriving them from claimed.
     Returns (match: bool, actual_jurisdiction: str)
     """
-    normalized_claim = normalize_jurisdiction(claimed)
+    if claimed_norm is None:
+        claimed_norm = normalize_jurisdiction(claimed)
+    if city_claim is None:
+        city_claim = is_city_claim(claimed)
     
-    if is_city_claim(claimed):
+    if city_claim:
         # Must match city
         if actual_city:
-            normalized_actual = normalize_jurisdiction(actual_city)
-            return normalized_claim == normalized_actual, actual_city
+            normalized_actual = actual_city_norm if actual_city_norm is not None else normalize_jurisdiction(actual_city)
+            return claimed_norm == normalized_actual, actual_city
         return False, actual_county or "Unincorporated area"
     else:
         # County coupons are valid only in unincorporated county areas.
         if actual_county:
-            normalized_actual = normalize_jurisdiction(actual_county)
-            county_matches = normalized_claim == normalized_actual
+            normalized_actual = actual_county_norm if actual_county_norm is not None else normalize_jurisdiction(actual_county)
+            county_matches = claimed_norm == normalized_actual
             if not county_matches:
                 return False, actual_county
 
@@ -312,6 +659,107 @@ def jurisdictions_match(claimed: str, actual_city: str, actual_county: str) -> t
         return False, "Unknown"
 
 
+def _normalize_jurisdictions(names: pd.Series) -> pd.Series:
+    """Vectorized normalize_jurisdiction over a Series of names."""
+    return (
+        names.fillna("").astype(str).str.lower().str.strip()
+        .str.replace(_JURISDICTION_AFFIXES, "", regex=True)
+        .str.replace(r"\s+", " ", regex=True).str.strip()
+    )
+
+
+def jurisdictions_match_many(
+    claims,
+    actual_cities,
+    actual_counties,
+    actual_city_norms=None,
+    actual_county_norms=None,
+) -> tuple:
+    """
+    Vectorized jurisdictions_match for batch validation.
+    Returns (matches: numpy bool array, actual_jurisdictions: list)
+    """
+    claims = pd.Series(claims, dtype=object).fillna("").astype(str)
+    cities = pd.Series(actual_cities, dtype=object).fillna("").astype(str)
+    counties = pd.Series(actual_counties, dtype=object).fillna("").astype(str)
+
+    claim_norm = _normalize_jurisdictions(claims).to_numpy()
+    if actual_city_norms is None:
+        actual_city_norms = _normalize_jurisdictions(cities)
+    if actual_county_norms is None:
+        actual_county_norms = _normalize_jurisdictions(counties)
+    city_norm = np.asarray(actual_city_norms, dtype=object)
+    county_norm = np.asarray(actual_county_norms, dtype=object)
+
+    city_claim = claims.str.lower().str.contains("city", regex=False).to_numpy()
+    has_city = (cities != "").to_numpy()
+    has_county = (counties != "").to_numpy()
+    city_lower = cities.str.strip().str.lower()
+    unincorporated = ((city_lower == "") | city_lower.str.contains("unincorporated", regex=False)).to_numpy()
+    city_matches = claim_norm == city_norm
+    county_matches = claim_norm == county_norm
+
+    matches = np.where(
+        city_claim,
+        has_city & city_matches,
+        has_county & county_matches & unincorporated,
+    )
+    # Mirrors the branches of jurisdictions_match.
+    actual = np.select(
+        [
+            city_claim & has_city,
+            city_claim & has_county,
+            city_claim,
+            ~has_county,
+            ~county_matches,
+            ~unincorporated,
+        ],
+        [
+            cities.to_numpy(),
+            counties.to_numpy(),
+            "Unincorporated area",
+            "Unknown",
+            counties.to_numpy(),
+            cities.to_numpy(),
+        ],
+        default=counties.to_numpy(),
+    )
+    return matches, actual.tolist()
+
+
+# ---------------------------------------------------
+# SHARED VALIDATION PIPELINE
+# ---------------------------------------------------
+async def _resolve_address_to_district(address: str) -> tuple:
+    """
+    Geocode an address and find the tax district it falls in, through the
+    geocode and district caches.
+    Returns (district, matched_address, error) where error is a message
+    and district is None when either step fails.
+    """
+    lat, lon, matched_address = await geocode_address(address)
+    if lat is None or lon is None:
+        return None, None, "Address could not be geocoded"
+
+    district = find_tax_district_cached(lat, lon)
+    if not district:
+        return None, matched_address, "Address not found in California tax district data"
+    return district, matched_address, None
+
+
+def _compare(claimed: str, district: District, claimed_norm: str | None = None, city_claim: bool | None = None) -> tuple:
+    """jurisdictions_match against a district's names. Returns (match, actual_jurisdiction)."""
+    return jurisdictions_match(
+        claimed,
+        district.city,
+        district.county,
+        district.city_norm,
+        district.county_norm,
+        claimed_norm,
+        city_claim,
+    )
+
+
 # ---------------------------------------------------
 # API ENDPOINT
 # ---------------------------------------------------
@@ -330,31 +778,14 @@ async def validate_jurisdiction(
     - matched_address: the geocoded address
     """
     try:
-        # Geocode the address
-        lat, lon, matched_address = geocode_address(address)
-        
-        if lat is None or lon is None:
-            return {
-                "status": "error",
-                "message": "Address could not be geocoded"
-            }
-        
-        # Find tax district
-        gdf = load_tax_districts()
-        district = find_tax_district(lat, lon, gdf)
-        
-        if not district:
+        district, matched_address, error = await _resolve_address_to_district(address)
+        if error:
             return {
                 "status": "error",
-                "message": "Address not found in California tax district data"
+                "message": error
             }
         
-        # Compare jurisdictions
-        match, actual = jurisdictions_match(
-            jurisdiction,
-            district.get("city"),
-            district.get("county")
-        )
+        match, actual = _compare(jurisdiction, district)
         
         return {
             "status": "accepted" if match else "denied",
@@ -370,6 +801,89 @@ async def validate_jurisdiction(
         }
 
 
+# ---------------------------------------------------
+# BATCH VALIDATION ENDPOINT (for coupon-import jobs)
+# ---------------------------------------------------
+BATCH_MAX_SIZE = 1000
+# Cap on concurrent ArcGIS calls per batch so one large batch can't exhaust the client pool
+BATCH_GEOCODE_CONCURRENCY = 16
+
+
+class ValidateItem(BaseModel):
+    address: str
+    jurisdiction: str
+
+
+@app.post("/api/validate/batch")
+async def validate_jurisdiction_batch(items: list[ValidateItem]):
+    """
+    Validate many address/jurisdiction pairs in one call.
+    
+    Addresses are geocoded concurrently and all points are resolved
+    against the tax districts with a single spatial-index query.
+    
+    Returns:
+    - results: one /api/validate-style result per item, in input order
+    """
+    if len(items) > BATCH_MAX_SIZE:
+        raise HTTPException(status_code=400, detail=f"Batch size exceeds {BATCH_MAX_SIZE} items")
+
+    semaphore = asyncio.Semaphore(BATCH_GEOCODE_CONCURRENCY)
+
+    async def geocode_limited(address: str):
+        async with semaphore:
+            return await geocode_address(address)
+
+    geocoded = await asyncio.gather(
+        *(geocode_limited(item.address) for item in items),
+        return_exceptions=True,
+    )
+
+    results = [None] * len(items)
+    located = []
+    for i, result in enumerate(geocoded):
+        if isinstance(result, Exception):
+            results[i] = {"status": "error", "message": str(result)}
+        elif result[0] is None or result[1] is None:
+            results[i] = {"status": "error", "message": "Address could not be geocoded"}
+        else:
+            located.append(i)
+
+    if located:
+        districts = find_tax_districts(
+            [geocoded[i][0] for i in located],
+            [geocoded[i][1] for i in located],
+            load_tax_districts(),
+        )
+        found = []
+        for i, district in zip(located, districts):
+            if district:
+                found.append((i, district))
+            else:
+                results[i] = {
+                    "status": "error",
+                    "message": "Address not found in California tax district data"
+                }
+
+        # Compare all jurisdictions in one vectorized pass
+        matches, actuals = jurisdictions_match_many(
+            [items[i].jurisdiction for i, _ in found],
+            [district.city for _, district in found],
+            [district.county for _, district in found],
+            [district.city_norm for _, district in found],
+            [district.county_norm for _, district in found],
+        )
+        for (i, _), match, actual in zip(found, matches, actuals):
+            results[i] = {
+                "status": "accepted" if match else "denied",
+                "claimed_jurisdiction": items[i].jurisdiction,
+                "actual_jurisdiction": actual,
+                "matched_address": geocoded[i][2]
+            }
+
+    return {"results": results}
+
+
 # ---------------------------------------------------
 # COUPON VALIDATION ENDPOINT
 # ---------------------------------------------------
@@ -397,8 +911,8 @@ async def validate_coupon(
         # Normalize coupon code
         coupon_code = coupon.strip().upper()
         
-        # Load coupon data
-        coupons = load_coupons()
+        # Load coupon data (a refresh downloads/parses the sheet, so keep it off the event loop)
+        coupons = await run_in_threadpool(load_coupons)
         
         # Check if coupon exists
         if coupon_code not in coupons:
@@ -416,7 +930,7 @@ async def validate_coupon(
                 "status": "denied",
                 "coupon": coupon_code,
                 "jurisdiction": coupon_data['jurisdiction'],
-                "reason": f"Coupon is {coupon_data['status']}"
+                "reason": f"Coupon is {coupon_data['status']}" if coupon_data['status'] else "Coupon has no program status"
             }
         
         # Check date validity
@@ -429,33 +943,26 @@ async def validate_coupon(
                 "reason": date_reason
             }
         
-        # Geocode the address
-        lat, lon, matched_address = geocode_address(address)
-        
-        if lat is None or lon is None:
+        # A blank jurisdiction can't match any address
+        if not coupon_data['jurisdiction']:
             return {
-                "status": "error",
+                "status": "denied",
                 "coupon": coupon_code,
-                "reason": "Address could not be geocoded"
+                "jurisdiction": "",
+                "reason": "Coupon has no jurisdiction"
             }
         
-        # Find tax district
-        gdf = load_tax_districts()
-        district = find_tax_district(lat, lon, gdf)
-        
-        if not district:
+        district, matched_address, error = await _resolve_address_to_district(address)
+        if error:
             return {
                 "status": "error",
                 "coupon": coupon_code,
-                "reason": "Address not found in California tax district data"
+                "reason": error
             }
         
-        # Compare jurisdictions
         claimed_jurisdiction = coupon_data['jurisdiction']
-        match, actual = jurisdictions_match(
-            claimed_jurisdiction,
-            district.get("city"),
-            district.get("county")
+        match, actual = _compare(
+            claimed_jurisdiction, district, coupon_data['jurisdiction_norm'], coupon_data['is_city']
         )
         
         if match:
@@ -662,32 +1169,103 @@ HTML_FORM = """
 </html>
 """
 
+# Encoded and hashed once at import instead of on every request.
+HTML_FORM_BYTES = HTML_FORM.encode("utf-8")
+HTML_ETAG = '"' + hashlib.blake2b(HTML_FORM_BYTES, digest_size=8).hexdigest() + '"'
+HTML_CACHE_HEADERS = {"ETag": HTML_ETAG, "Cache-Control": "public, max-age=3600"}
+
+
 @app.get("/", response_class=HTMLResponse)
-async def root():
+async def root(request: Request):
     """Serve the web form for manual lookups."""
-    return HTML_FORM
+    # Probes and revalidating browsers get a bodiless 304 when the form is unchanged.
+    if_none_match = request.headers.get("if-none-match", "")
+    if HTML_ETAG in (tag.strip() for tag in if_none_match.split(",")):
+        return Response(status_code=304, headers=HTML_CACHE_HEADERS)
+
+    return Response(
+        content=HTML_FORM_BYTES,
+        media_type="text/html",
+        headers=HTML_CACHE_HEADERS,
+    )
 
 
 # ---------------------------------------------------
 # HEALTH CHECK
 # ---------------------------------------------------
+HEALTH_BODY = b'{"status":"healthy"}'
+
+
 @app.get("/health")
 async def health():
-    return {"status": "healthy"}
+    return Response(content=HEALTH_BODY, media_type="application/json")
+
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """Report geocode and district cache usage for tuning their sizes."""
+    return {
+        "geocode": {
+            "hits": _geocode_cache_hits,
+            "misses": _geocode_cache_misses,
+            "size": len(_geocode_cache),
+            "maxsize": GEOCODE_CACHE_SIZE,
+        },
+        "district": {
+            "hits": _district_cell_hits,
+            "misses": _district_cell_misses,
+            "size": len(_district_cells),
+            "maxsize": DISTRICT_CELL_CACHE_SIZE,
+        },
+    }
 
 
 # ---------------------------------------------------
-# GCS SYNC HELPER
+# GCS SYNC / FILE HELPERS
 # ---------------------------------------------------
-def _sync_to_gcs(content: bytes, blob_name: str):
-    """Best-effort upload to GCS so new container instances get the latest data."""
+def _write_file_atomic(path: str, content: bytes):
+    """Write via a temp file + os.replace so concurrent readers never see a partial file."""
+    # A unique temp file per call, so concurrent uploads never share one
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def _store_uploaded_coupons(coupons: dict, content: bytes, save_path: str, stale_path: str) -> None:
+    """
+    Save an upload and publish its coupons, waiting out any refresh already
+    in flight. The other format's local file is removed: _fetch_coupons
+    prefers xlsx, so a leftover one would win back over a newer csv upload.
+    """
+    with _coupon_lock:
+        _write_file_atomic(save_path, content)
+        try:
+            os.remove(stale_path)
+        except FileNotFoundError:
+            pass
+        _publish_coupons(coupons, (save_path, os.stat(save_path).st_mtime_ns))
+
+
+def _sync_to_gcs(content: bytes, blob_name: str, stale_blob_name: str):
+    """
+    Best-effort upload to GCS so new container instances get the latest data.
+    The other format's blob is deleted so it can't shadow this upload.
+    """
     try:
-        client = gcs_storage.Client()
-        bucket = client.bucket(COUPONS_GCS_BUCKET)
+        bucket = _gcs_bucket()
         blob = bucket.blob(blob_name)
         content_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet" if blob_name.endswith(".xlsx") else "text/csv"
         blob.cache_control = "no-cache, max-age=0"
         blob.upload_from_string(content, content_type=content_type)
+        try:
+            bucket.blob(stale_blob_name).delete()
+        except NotFound:
+            pass
         logger.info("Synced %s to GCS bucket %s", blob_name, COUPONS_GCS_BUCKET)
     except Exception as e:
         logger.warning("GCS sync failed (non-fatal): %s", e)
@@ -698,9 +1276,8 @@ def _sync_to_gcs(content: bytes, blob_name: str):
 # ---------------------------------------------------
 @app.post("/api/upload-coupons")
 async def upload_coupons(
-    file: UploadFile = File(None),
+    request: Request,
     x_api_key: str = Header(None, alias="X-API-Key"),
-    request: Request = None
 ):
     """
     Upload a new coupon file (xlsx or csv) directly to the API.
@@ -709,16 +1286,20 @@ async def upload_coupons(
     Used by Power Automate to sync from SharePoint.
     
     Accepts both multipart form uploads and raw binary data.
+    The body is only read once the key checks out, so it isn't a File()
+    parameter (FastAPI would parse the form before the handler runs).
     """
-    # Verify API key
-    if x_api_key != UPLOAD_API_KEY:
+    # Verify API key (constant time)
+    if not hmac.compare_digest((x_api_key or "").encode(), UPLOAD_API_KEY.encode()):
         raise HTTPException(status_code=401, detail="Invalid API key")
     
     try:
         # Get file content - either from form upload or raw body
-        if file and file.filename:
-            content = await file.read()
-            filename = file.filename.lower()
+        if request.headers.get("content-type", "").startswith("multipart/form-data"):
+            form = await request.form()
+            file = form.get("file")
+            content = await file.read() if getattr(file, "filename", None) else b""
+            filename = file.filename.lower() if content else ""
         else:
             # Raw binary upload from Power Automate
             content = await request.body()
@@ -731,24 +1312,21 @@ async def upload_coupons(
         # Determine file type from content (Excel files start with PK)
         is_excel = content[:2] == b'PK'
         if is_excel:
-            save_path = COUPONS_XLSX_PATH
-            gcs_blob_name = "coupons.xlsx"
+            save_path, stale_path = COUPONS_XLSX_PATH, COUPONS_CSV_PATH
+            gcs_blob_name, stale_blob_name = "coupons.xlsx", "coupons.csv"
         else:
-            save_path = COUPONS_CSV_PATH
-            gcs_blob_name = "coupons.csv"
+            save_path, stale_path = COUPONS_CSV_PATH, COUPONS_XLSX_PATH
+            gcs_blob_name, stale_blob_name = "coupons.csv", "coupons.xlsx"
             
-        with open(save_path, 'wb') as f:
-            f.write(content)
-        
-        _sync_to_gcs(content, gcs_blob_name)
-        
-        # Clear the coupon cache to force reload
-        global _coupon_cache, _coupon_cache_time
-        _coupon_cache = {}
-        _coupon_cache_time = None
+        # Parse in memory first so a malformed upload never replaces the good file
+        try:
+            coupons = await run_in_threadpool(_parse_coupon_bytes, content, is_excel)
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"Could not parse coupon file: {e}")
         
-        # Reload coupons to verify file is valid
-        coupons = load_coupons(force_refresh=True)
+        # Save and serve the uploaded coupons immediately
+        await run_in_threadpool(_store_uploaded_coupons, coupons, content, save_path, stale_path)
+        await run_in_threadpool(_sync_to_gcs, content, gcs_blob_name, stale_blob_name)
         
         return {
             "status": "success",